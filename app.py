@@ -3,7 +3,7 @@ Flight Information Chatbot UI using Streamlit
 """
 import streamlit as st
 from query_handler import process_query
-from ollama_api import check_ollama_availability, generate_response
+from ollama_api import check_ollama_availability, generate_response, start_keep_warm
 
 # Set Streamlit page config
 st.set_page_config(
@@ -11,6 +11,11 @@ st.set_page_config(
     page_icon="✈️",
 )
 
+@st.cache_resource
+def start_ollama_keep_warm():
+    """Warm up the Ollama model once per server process and keep it loaded."""
+    return start_keep_warm()
+
 # Initialize chat history in session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -27,6 +32,8 @@ st.title("✈️ Flight Information Assistant")
 ollama_status, ollama_message = check_ollama_availability()
 if not ollama_status:
     st.warning("⚠️ Ollama server is unavailable. Responses will be simplified.")
+else:
+    start_ollama_keep_warm()
 
 # Show instructions
 st.markdown("""
@@ -0,0 +1,192 @@
+"""
+Latency benchmark for Ollama prompt prefix reuse and keep-alive warmup.
+
+Runs ollama_stub.StubOllamaServer with a SIMULATED cost model, not a real Ollama server:
+- a model load penalty when the model has been unloaded (idle longer than keep_alive,
+  which defaults to 5 minutes like Ollama's own default)
+- prompt evaluation time proportional to the characters not already in a cache slot. Like
+  Ollama, the server has OLLAMA_NUM_PARALLEL slots and each request reuses the slot with the
+  longest matching prefix, so with one slot the response prompt evicts the extraction prefix
+
+Idle time between queries advances a simulated clock instead of sleeping, so realistic gaps
+(seconds to minutes) run quickly. The load and per-character costs are illustrative constants,
+so compare the scenarios with each other rather than reading the numbers as real latencies.
+Each simulated user query sends the extraction prompt and then the response prompt, as the
+app does. Prompt layout, cache slots and keep-alive are reported separately and combined.
+
+Usage: python benchmark_ollama.py
+"""
+import json
+import os
+import threading
+import time
+
+import requests
+
+from mock_database import flights
+from ollama_stub import StubOllamaServer
+
+MODEL_LOAD_SECONDS = 0.3
+SECONDS_PER_CHAR = 0.0004
+# Ollama unloads a model 5 minutes after its last request unless keep_alive says otherwise
+DEFAULT_KEEP_ALIVE_SECONDS = 300
+# Simulated seconds between user queries: steady traffic vs. queries after the model would unload
+TRAFFIC_PATTERNS = {"busy (30 s gaps)": 30, "idle (10 min gaps)": 600}
+
+QUERIES = [
+    "Show me flights from New York to London",
+    "Show me flight NY100",
+    "Are there any flights from Chicago?",
+    "Flights from Miami with South American Airways",
+    "What flights leave San Francisco?",
+]
+
+
+def keep_alive_seconds(value):
+    """Convert an Ollama keep_alive value ("30m", "10s", -1, 0) into seconds."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    units = {"s": 1, "m": 60, "h": 3600}
+    if isinstance(value, str) and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+
+class SimulatedOllamaCost:
+    """Cost model for StubOllamaServer driven by a simulated clock, with one KV cache per slot."""
+
+    def __init__(self, num_parallel=1):
+        self.lock = threading.Lock()
+        self.now = 0.0
+        self.loaded_until = None
+        self.slots = [""] * num_parallel
+        self.slot_used_at = [0.0] * num_parallel
+
+    def idle(self, seconds):
+        with self.lock:
+            self.now += seconds
+
+    def generate_cost(self, payload):
+        prompt, keep_alive = payload.get("prompt", ""), payload.get("keep_alive")
+        with self.lock:
+            cost = 0.0
+            if self.loaded_until is None or self.now >= self.loaded_until:
+                # A reload starts with empty KV caches
+                cost += MODEL_LOAD_SECONDS
+                self.slots = [""] * len(self.slots)
+            if prompt:
+                # Longest matching prefix wins; ties go to the least recently used slot
+                shared, _, slot = max(
+                    (len(os.path.commonprefix([cached, prompt])), -self.slot_used_at[i], i)
+                    for i, cached in enumerate(self.slots)
+                )
+                cost += (len(prompt) - shared) * SECONDS_PER_CHAR
+                self.slots[slot] = prompt
+                self.slot_used_at[slot] = self.now
+            self.now += cost
+            self.loaded_until = self.now + keep_alive_seconds(keep_alive)
+            return cost
+
+
+def legacy_extraction_prompt(query):
+    """The original extraction prompt layout, with the query embedded mid-instruction."""
+    return f"""
+    Extract flight details from the following user query and return only valid JSON.
+    Do not include any explanations, additional text, or markdown.
+
+    Query: "{query}"
+
+    The response should be in this exact JSON format:
+    {{
+      "origin": "City Name",
+      "destination": "City Name",
+      "flight_number": "Flight Number",
+      "date": "YYYY-MM-DD",
+      "airline": "Airline Name"
+    }}
+
+    If a value is missing, set it to `null`.
+    """
+
+
+def legacy_response_prompt(query, flight_info):
+    """The original response prompt layout, with the query first."""
+    return f"""
+        User Query: {query}
+        Available Flights: {flight_info}
+        Generate a natural language response summarizing these flights, including flight number, time, and airline details if available, or politely indicate no flights were found.
+        """
+
+
+def run_scenario(stub, prompts, gap_seconds, num_parallel=1, keep_alive=None, warmup=None):
+    """
+    Replay QUERIES against a fresh simulated server, sending the extraction and then the
+    response prompt for each, and return (extraction, response) latencies per query.
+    """
+    build_extraction, build_response = prompts
+    cost = SimulatedOllamaCost(num_parallel)
+    stub.cost_model = cost
+    if warmup:
+        warmup(stub.url)
+    latencies = []
+    for i, query in enumerate(QUERIES):
+        cost.idle(gap_seconds)
+        if warmup and keep_alive_seconds(keep_alive) < gap_seconds:
+            # The keep-warm thread would have re-pinged the model during the gap
+            warmup(stub.url)
+        flight_info = json.dumps([flights[i % len(flights)]], indent=2)
+        query_latencies = []
+        for prompt in (build_extraction(query), build_response(query, flight_info)):
+            payload = {"model": "stub", "prompt": prompt, "stream": False}
+            if keep_alive is not None:
+                payload["keep_alive"] = keep_alive
+            start = time.perf_counter()
+            requests.post(f"{stub.url}/api/generate", json=payload, timeout=10)
+            query_latencies.append(time.perf_counter() - start)
+        latencies.append(tuple(query_latencies))
+    return latencies
+
+
+def report(label, latencies):
+    def avg_ms(values):
+        return sum(values) / len(values) * 1000
+
+    extraction, response = zip(*latencies)
+    totals = [sum(pair) for pair in latencies]
+    print(f"  {label:<40} first={totals[0] * 1000:7.1f} ms  avg={avg_ms(totals):7.1f} ms"
+          f"  (extraction {avg_ms(extraction):6.1f} ms, response {avg_ms(response):6.1f} ms)")
+
+
+def main():
+    stub = StubOllamaServer()
+
+    # Point the app modules at the stub before importing them
+    os.environ["OLLAMA_URL"] = stub.url
+    import ollama_api
+    from query_handler import build_extraction_prompt
+
+    legacy = (legacy_extraction_prompt, legacy_response_prompt)
+    prefix = (build_extraction_prompt, ollama_api.build_response_prompt)
+    keep_alive, warmup = ollama_api.OLLAMA_KEEP_ALIVE, ollama_api.warmup_ollama
+    scenarios = [
+        ("baseline (legacy prompts, 1 slot)", legacy, 1, None, None),
+        ("prefix prompts, 1 slot", prefix, 1, None, None),
+        ("legacy prompts, 2 slots", legacy, 2, None, None),
+        ("prefix prompts, 2 slots", prefix, 2, None, None),
+        (f"legacy, 1 slot, keep_alive={keep_alive}", legacy, 1, keep_alive, warmup),
+        (f"prefix, 2 slots, keep_alive={keep_alive}", prefix, 2, keep_alive, warmup),
+    ]
+    print("Simulated costs - compare scenarios, not absolute numbers.")
+    print("Times are per user query: extraction prompt + response prompt.")
+    for pattern, gap_seconds in TRAFFIC_PATTERNS.items():
+        print(f"Traffic: {pattern}")
+        for label, prompts, num_parallel, scenario_keep_alive, scenario_warmup in scenarios:
+            latencies = run_scenario(stub, prompts, gap_seconds, num_parallel, scenario_keep_alive, scenario_warmup)
+            report(label, latencies)
+
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
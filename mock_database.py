@@ -1,22 +1,3 @@
-import os
-import requests
-
-def check_ollama_availability():
-    """Check if the Ollama server is available."""
-    ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-    try:
-        response = requests.get(f"{ollama_url}/api/tags", timeout=3)
-        if response.status_code == 200:
-            print(f"🟢 Ollama server is available at {ollama_url}.")
-            return True
-        else:
-            print(f"⚠️ Ollama server returned status {response.status_code} at {ollama_url}.")
-            return False
-    except requests.RequestException as e:
-        print(f"⚠️ Ollama server is not available at {ollama_url}: {str(e)}")
-        return False
-
-
 # Mock database: list of flights
 flights = [
     {"flight_number": "NY100", "origin": "New York", "destination": "London", "time": "2025-05-01 08:00", "airline": "Global Airways"},
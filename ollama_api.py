@@ -1,31 +1,247 @@
 import os
 import json
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from langchain_ollama import OllamaLLM  # Correct import
 from typing import Tuple, List
 from dotenv import load_dotenv
 
 load_dotenv()
+
+def parse_keep_alive(value: str):
+    """
+    Ollama reads a string keep_alive as a Go duration ("30m"), so a bare number like "-1"
+    would be rejected. Pass plain numbers through as seconds instead.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+# Comma-separated list of Ollama replicas to balance across; defaults to the single OLLAMA_URL
+OLLAMA_URLS = [url.strip() for url in os.getenv("OLLAMA_URLS", OLLAMA_URL).split(",") if url.strip()]
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:3b")
+# How long the Ollama server keeps the model loaded after a request (e.g. "30m", "-1" for forever)
+OLLAMA_KEEP_ALIVE = parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+# Seconds between keep-warm pings; 0 disables the background keep-warm thread
+OLLAMA_KEEP_WARM_INTERVAL = int(os.getenv("OLLAMA_KEEP_WARM_INTERVAL", "300"))
+# Seconds to wait for one endpoint to load the model during warmup
+OLLAMA_WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", "30"))
+# Seconds before a single LLM call to one endpoint is abandoned and failed over
+OLLAMA_REQUEST_TIMEOUT = float(os.getenv("OLLAMA_REQUEST_TIMEOUT", "60"))
+# Smoothing factor for the per-endpoint latency EWMA (higher reacts faster)
+OLLAMA_EWMA_ALPHA = float(os.getenv("OLLAMA_EWMA_ALPHA", "0.3"))
+# Seconds a failed endpoint is deprioritized before it is tried again
+OLLAMA_RETRY_SECONDS = float(os.getenv("OLLAMA_RETRY_SECONDS", "30"))
 
-def initialize_ollama():
+# Fixed instruction block sent first; only the short variable suffix changes per query.
+# The cached prefix survives the interleaved extraction prompt only when the Ollama server
+# has a cache slot per prompt kind (OLLAMA_NUM_PARALLEL >= 2, see ollama-deployment.yaml).
+RESPONSE_PROMPT_PREFIX = """You are a flight information assistant.
+Generate a natural language response summarizing the available flights, including flight number, time, and airline details if available, or politely indicate no flights were found.
+"""
+
+def build_response_prompt(query: str, flight_info: str) -> str:
+    """Append the per-request flights and query to the stable response prefix."""
+    return f"{RESPONSE_PROMPT_PREFIX}\nAvailable Flights: {flight_info}\nUser Query: {query}\n"
+
+def initialize_ollama(base_url: str = OLLAMA_URL):
     try:
-        ollama_llm = OllamaLLM(model=OLLAMA_MODEL, base_url=OLLAMA_URL)
+        ollama_llm = OllamaLLM(
+            model=OLLAMA_MODEL,
+            base_url=base_url,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            client_kwargs={"timeout": OLLAMA_REQUEST_TIMEOUT},
+        )
         print(f"🟢 Successfully initialized Ollama LLM with model: {OLLAMA_MODEL}")
         return ollama_llm
     except Exception as e:
         print(f"❌ Failed to initialize Ollama LLM: {str(e)}")
         return None
 
-ollama_llm = initialize_ollama()
+class OllamaEndpoint:
+    """One Ollama replica with its client and load/health statistics."""
+
+    def __init__(self, url: str, llm):
+        self.url = url
+        self.llm = llm
+        self.outstanding = 0
+        self.ewma_latency = None
+        self.healthy = True
+        self.retry_at = 0.0
+
+
+class OllamaBackendPool:
+    """
+    Routes LLM calls across several Ollama replicas.
+    Each call goes to the healthy endpoint with the fewest outstanding requests (ties broken
+    by EWMA latency) and fails over to the next endpoint if it raises or exceeds
+    OLLAMA_REQUEST_TIMEOUT. Failed endpoints are
+    only tried after OLLAMA_RETRY_SECONDS, or as a last resort once every healthy one failed.
+    """
+
+    def __init__(self, urls: List[str], client_factory=initialize_ollama,
+                 ewma_alpha: float = OLLAMA_EWMA_ALPHA, retry_seconds: float = OLLAMA_RETRY_SECONDS):
+        self.endpoints = []
+        for url in urls:
+            llm = client_factory(url)
+            if llm:
+                self.endpoints.append(OllamaEndpoint(url, llm))
+        self.ewma_alpha = ewma_alpha
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.endpoints)
+
+    def _rank(self, endpoint: OllamaEndpoint, now: float):
+        cooling_down = not endpoint.healthy and now < endpoint.retry_at
+        return (cooling_down, endpoint.outstanding, endpoint.ewma_latency or 0.0)
+
+    def ordered_endpoints(self) -> List[OllamaEndpoint]:
+        """Endpoints in the order a call would try them right now."""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.endpoints, key=lambda endpoint: self._rank(endpoint, now))
+
+    def _acquire(self, tried: set):
+        """Pick the best untried endpoint and count the request against it atomically."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint.url not in tried]
+            if not candidates:
+                return None
+            endpoint = min(candidates, key=lambda candidate: self._rank(candidate, now))
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _release(self, endpoint: OllamaEndpoint, latency: float = None):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if latency is None:
+                endpoint.healthy = False
+                endpoint.retry_at = time.monotonic() + self.retry_seconds
+                return
+            endpoint.healthy = True
+            if endpoint.ewma_latency is None:
+                endpoint.ewma_latency = latency
+            else:
+                endpoint.ewma_latency = self.ewma_alpha * latency + (1 - self.ewma_alpha) * endpoint.ewma_latency
+
+    def _mark_health(self, endpoint: OllamaEndpoint, healthy: bool):
+        with self._lock:
+            endpoint.healthy = healthy
+            if not healthy:
+                endpoint.retry_at = time.monotonic() + self.retry_seconds
+
+    def invoke(self, prompt: str) -> str:
+        """Send the prompt to the best endpoint, failing over until one succeeds."""
+        tried = set()
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise RuntimeError(f"All Ollama endpoints failed: {last_error}")
+            tried.add(endpoint.url)
+            start = time.perf_counter()
+            try:
+                response = endpoint.llm.invoke(prompt)
+            except Exception as e:
+                self._release(endpoint)
+                print(f"⚠️ Ollama endpoint {endpoint.url} failed: {str(e)}")
+                last_error = e
+                continue
+            self._release(endpoint, time.perf_counter() - start)
+            return response
+
+    def _warm_endpoint(self, endpoint: OllamaEndpoint, timeout: float) -> bool:
+        with self._lock:
+            endpoint.outstanding += 1
+        start = time.perf_counter()
+        warm = warmup_ollama(endpoint.url, timeout)
+        self._release(endpoint, time.perf_counter() - start if warm else None)
+        return warm
+
+    def warmup(self, timeout: float = None) -> bool:
+        """
+        Warm every endpoint in parallel. Each round trip updates the endpoint's health and
+        EWMA latency, so replicas that receive no user traffic are still re-measured.
+        """
+        if not self.endpoints:
+            return False
+        timeout = OLLAMA_WARMUP_TIMEOUT if timeout is None else timeout
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as executor:
+            results = list(executor.map(lambda endpoint: self._warm_endpoint(endpoint, timeout), self.endpoints))
+        return any(results)
+
+    def check_availability(self) -> Tuple[bool, str]:
+        """Probe endpoints in routing order and stop at the first one that responds."""
+        if not self.endpoints:
+            return False, "⚠️ Ollama server is not available: no endpoints configured"
+        errors = []
+        for endpoint in self.ordered_endpoints():
+            try:
+                response = requests.get(f"{endpoint.url}/api/tags", timeout=3)
+            except requests.RequestException as e:
+                self._mark_health(endpoint, False)
+                errors.append(f"{endpoint.url}: {str(e)}")
+                continue
+            if response.status_code == 200:
+                self._mark_health(endpoint, True)
+                return True, f"🟢 Ollama server is available at {endpoint.url}"
+            self._mark_health(endpoint, False)
+            errors.append(f"{endpoint.url}: status {response.status_code}")
+        return False, f"⚠️ Ollama server is not available at {', '.join(errors)}"
+
+
+ollama_llm = OllamaBackendPool(OLLAMA_URLS)
 
 def check_ollama_availability() -> Tuple[bool, str]:
+    return ollama_llm.check_availability()
+
+def warmup_ollama(base_url: str = OLLAMA_URL, timeout: float = OLLAMA_WARMUP_TIMEOUT) -> bool:
+    """
+    Load the model into memory on the Ollama server without generating any tokens.
+    An empty prompt makes Ollama load the model and refresh its keep_alive timer.
+    """
     try:
-        response = requests.get(f"{OLLAMA_URL}/api/tags", timeout=3)
-        return response.status_code == 200, f"🟢 Ollama server is available at {OLLAMA_URL}"
+        response = requests.post(
+            f"{base_url}/api/generate",
+            json={"model": OLLAMA_MODEL, "prompt": "", "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=timeout,
+        )
+        if response.status_code == 200:
+            print(f"🟢 Ollama model {OLLAMA_MODEL} is warm at {base_url} (keep_alive={OLLAMA_KEEP_ALIVE})")
+            return True
+        print(f"⚠️ Ollama warmup at {base_url} returned status {response.status_code}")
+        return False
     except requests.RequestException as e:
-        return False, f"⚠️ Ollama server is not available at {OLLAMA_URL}: {str(e)}"
+        print(f"⚠️ Ollama warmup at {base_url} failed: {str(e)}")
+        return False
+
+def start_keep_warm(interval: int = OLLAMA_KEEP_WARM_INTERVAL):
+    """
+    Warm the model on every pool endpoint once and then re-ping them every `interval` seconds from a daemon thread.
+    Returns the threading.Event that stops the loop, or None when keep-warm is disabled.
+    """
+    if interval <= 0:
+        return None
+    stop_event = threading.Event()
+
+    def keep_warm_loop():
+        ollama_llm.warmup()
+        while not stop_event.wait(interval):
+            ollama_llm.warmup()
+
+    threading.Thread(target=keep_warm_loop, name="ollama-keep-warm", daemon=True).start()
+    return stop_event
 
 def generate_fallback_response(query: str, flights: List[dict]) -> str:
     if not flights:
@@ -40,18 +256,14 @@ def generate_fallback_response(query: str, flights: List[dict]) -> str:
     return response.strip()
 
 def generate_response(query: str, flights: List[dict]) -> str:
-    is_available, message = check_ollama_availability()
-    if not is_available or not ollama_llm:
-        print(f"⚠️ {message if not is_available else 'Ollama model not initialized'}")
+    # No availability pre-check: the pool fails over itself and raises once every endpoint failed
+    if not ollama_llm:
+        print("⚠️ Ollama model not initialized")
         return generate_fallback_response(query, flights)
 
     try:
         flight_info = json.dumps(flights, indent=2) if flights else "No matching flights found."
-        prompt = f"""
-        User Query: {query}
-        Available Flights: {flight_info}
-        Generate a natural language response summarizing these flights, including flight number, time, and airline details if available, or politely indicate no flights were found.
-        """
+        prompt = build_response_prompt(query, flight_info)
         print("🟢 Sending prompt to Ollama for response generation...")
         response = ollama_llm.invoke(prompt)
         return response.strip() if response else generate_fallback_response(query, flights)
@@ -0,0 +1,57 @@
+"""
+Local stub of the Ollama HTTP API, shared by the tests and benchmark_ollama.py.
+Answers /api/tags and /api/generate (streaming or not) after a configurable delay.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, content_type="application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_body(json.dumps({"models": []}).encode())
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.stub.request_delay(payload))
+        reply = f"reply from {self.server.server_address[1]}"
+        done = {"model": payload.get("model"), "created_at": "2025-05-01T00:00:00Z", "response": "", "done": True}
+        if not payload.get("stream", True):
+            self.send_body(json.dumps({**done, "response": reply}).encode())
+            return
+        lines = [{**done, "response": reply, "done": False}, done]
+        self.send_body("".join(json.dumps(line) + "\n" for line in lines).encode(), "application/x-ndjson")
+
+
+class StubOllamaServer:
+    """
+    Runs a stub Ollama server on a free local port in a background thread.
+    Each generate call sleeps for `delay` seconds plus whatever `cost_model.generate_cost(payload)` returns.
+    """
+
+    def __init__(self, delay: float = 0.0, cost_model=None):
+        self.delay = delay
+        self.cost_model = cost_model
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def request_delay(self, payload: dict) -> float:
+        cost = self.cost_model.generate_cost(payload) if self.cost_model else 0.0
+        return self.delay + cost
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -2,26 +2,34 @@ import json
 import os
 import re
 from dotenv import load_dotenv
-from langchain_ollama import OllamaLLM
-from mock_database import search_flights, check_ollama_availability
+from mock_database import search_flights
+# Extraction shares the response pool so both see the same replica load and health
+from ollama_api import ollama_llm
 
 # Load environment variables
 load_dotenv()
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:3b")
-OLLAMA_AVAILABLE = check_ollama_availability()
 
-# Initialize Ollama LLM
-def initialize_ollama():
-    """Initialize the Ollama LLM model safely."""
-    try:
-        ollama_llm = OllamaLLM(model=OLLAMA_MODEL)
-        print(f"🟢 Successfully initialized Ollama LLM with model: {OLLAMA_MODEL}")
-        return ollama_llm
-    except Exception as e:
-        print(f"❌ Failed to initialize Ollama LLM: {str(e)}")
-        return None
+# Stable instruction prefix shared by every extraction request. Keeping the query out of it
+# lets a dedicated Ollama cache slot (OLLAMA_NUM_PARALLEL >= 2) reuse it between calls.
+EXTRACTION_PROMPT_PREFIX = """Extract flight details from the user query and return only valid JSON.
+Do not include any explanations, additional text, or markdown.
+
+The response should be in this exact JSON format:
+{
+  "origin": "City Name",
+  "destination": "City Name",
+  "flight_number": "Flight Number",
+  "date": "YYYY-MM-DD",
+  "airline": "Airline Name"
+}
 
-ollama_llm = initialize_ollama()
+If a value is missing, set it to `null`.
+"""
+
+def build_extraction_prompt(query):
+    """Append the user query as a short suffix to the stable extraction prefix."""
+    return f'{EXTRACTION_PROMPT_PREFIX}\nQuery: "{query}"\nJSON:'
 
 CITY_MAPPING = {
     "ny": "New York",
@@ -36,28 +44,12 @@ def extract_entities_ollama(query):
     Uses Ollama to extract structured flight details from a query and ensures correct data mapping.
     If Ollama fails to extract an entity, fallback to a keyword-based search.
     """
-    if not OLLAMA_AVAILABLE or not ollama_llm:
-        print("⚠️ Ollama server is unavailable. Using basic keyword search.")
-        return {}
+    if not ollama_llm:
+        print("⚠️ Ollama model not initialized. Using basic keyword search.")
+        return extract_entities_from_keywords(query)
 
     print(f"🟢 Using Ollama model: {OLLAMA_MODEL}")
-    prompt = f"""
-    Extract flight details from the following user query and return only valid JSON.
-    Do not include any explanations, additional text, or markdown.
-
-    Query: "{query}"
-
-    The response should be in this exact JSON format:
-    {{
-      "origin": "City Name",
-      "destination": "City Name",
-      "flight_number": "Flight Number",
-      "date": "YYYY-MM-DD",
-      "airline": "Airline Name"
-    }}
-
-    If a value is missing, set it to `null`.
-    """
+    prompt = build_extraction_prompt(query)
 
     try:
         print(f"🟢 Sending request to Ollama for entity extraction...")
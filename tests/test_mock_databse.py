@@ -1,8 +1,5 @@
 import unittest
-from unittest.mock import patch
-import os
-import requests
-from mock_database import flights, search_flights, check_ollama_availability
+from mock_database import flights, search_flights
 
 class TestMockDatabase(unittest.TestCase):
     def test_flight_data_exists(self):
@@ -58,22 +55,5 @@ class TestMockDatabase(unittest.TestCase):
         results = search_flights(destination="City Name")
         self.assertEqual(len(results), 0, "Should ignore 'City Name' as destination")
 
-    @patch("requests.get")
-    def test_check_ollama_availability_success(self, mock_get):
-        mock_response = mock_get.return_value
-        mock_response.status_code = 200
-        self.assertTrue(check_ollama_availability(), "Should return True when Ollama is available")
-
-    @patch("requests.get")
-    def test_check_ollama_availability_failure(self, mock_get):
-        mock_response = mock_get.return_value
-        mock_response.status_code = 500
-        self.assertFalse(check_ollama_availability(), "Should return False on server error")
-
-    @patch("requests.get")
-    def test_check_ollama_availability_exception(self, mock_get):
-        mock_get.side_effect = requests.RequestException("Connection error")
-        self.assertFalse(check_ollama_availability(), "Should return False on exception")
-
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
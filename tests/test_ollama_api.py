@@ -1,8 +1,16 @@
+import socket
 import pytest
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, Mock
 import os
-from ollama_api import initialize_ollama, check_ollama_availability, generate_fallback_response, generate_response, ollama_llm
+import time
+from ollama_api import (
+    initialize_ollama, check_ollama_availability, generate_fallback_response, generate_response, ollama_llm,
+    warmup_ollama, start_keep_warm, build_response_prompt, RESPONSE_PROMPT_PREFIX, OllamaBackendPool,
+    parse_keep_alive, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, OLLAMA_REQUEST_TIMEOUT
+)
+from ollama_stub import StubOllamaServer
 
 # Fixture to mock environment variables
 @pytest.fixture
@@ -19,9 +27,14 @@ def mock_env():
 def test_initialize_ollama_success(mock_ollama, mock_env):
     mock_instance = Mock()
     mock_ollama.return_value = mock_instance
-    result = initialize_ollama()
+    result = initialize_ollama("http://test:11434")
     assert result == mock_instance, "Should return OllamaLLM instance on success"
-    mock_ollama.assert_called_once_with(model="llama2:test", base_url="http://test:11434")
+    mock_ollama.assert_called_once_with(
+        model=OLLAMA_MODEL,
+        base_url="http://test:11434",
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        client_kwargs={"timeout": OLLAMA_REQUEST_TIMEOUT},
+    )
 
 @patch("ollama_api.OllamaLLM")
 def test_initialize_ollama_failure(mock_ollama, mock_env):
@@ -34,7 +47,8 @@ def test_initialize_ollama_failure(mock_ollama, mock_env):
 def test_check_ollama_availability_success(mock_get, mock_env):
     mock_response = mock_get.return_value
     mock_response.status_code = 200
-    is_available, message = check_ollama_availability()
+    with patch("ollama_api.ollama_llm", OllamaBackendPool(["http://test:11434"], lambda url: Mock())):
+        is_available, message = check_ollama_availability()
     assert is_available is True, "Should return True when server is available"
     assert "Ollama server is available" in message, "Should return success message"
     mock_get.assert_called_once_with("http://test:11434/api/tags", timeout=3)
@@ -46,6 +60,14 @@ def test_check_ollama_availability_failure(mock_get, mock_env):
     assert is_available is False, "Should return False on request exception"
     assert "Ollama server is not available" in message, "Should return error message"
 
+@patch("requests.get")
+def test_check_ollama_availability_server_error(mock_get, mock_env):
+    mock_get.return_value.status_code = 500
+    with patch("ollama_api.ollama_llm", OllamaBackendPool(["http://test:11434"], lambda url: Mock())):
+        is_available, message = check_ollama_availability()
+    assert is_available is False, "Should return False on server error"
+    assert "status 500" in message, "Should report the failing status"
+
 # 3. Tests for generate_fallback_response
 def test_generate_fallback_response_with_flights():
     flights = [
@@ -73,37 +95,203 @@ def test_generate_fallback_response_missing_fields():
 @patch("ollama_api.check_ollama_availability")
 @patch("ollama_api.ollama_llm.invoke")
 def test_generate_response_ollama_success(mock_invoke, mock_check, mock_env):
-    mock_check.return_value = (True, "Server available")
     mock_invoke.return_value = "Flight NY100 departs from New York to London at 08:00 with Global Airways."
-    with patch("ollama_api.ollama_llm", Mock()):
-        flights = [{"flight_number": "NY100", "origin": "New York", "destination": "London", "time": "2025-05-01 08:00", "airline": "Global Airways"}]
-        result = generate_response("flights from New York", flights)
-        assert "NY100" in result, "Should include flight details from Ollama"
-        assert "New York to London" in result, "Should include route"
-        mock_invoke.assert_called_once()
+    flights = [{"flight_number": "NY100", "origin": "New York", "destination": "London", "time": "2025-05-01 08:00", "airline": "Global Airways"}]
+    result = generate_response("flights from New York", flights)
+    assert "NY100" in result, "Should include flight details from Ollama"
+    assert "New York to London" in result, "Should include route"
+    mock_invoke.assert_called_once()
+    mock_check.assert_not_called()
 
-@patch("ollama_api.check_ollama_availability")
-def test_generate_response_ollama_unavailable(mock_check, mock_env):
-    mock_check.return_value = (False, "Server unavailable")
+@patch("ollama_api.ollama_llm.invoke")
+def test_generate_response_ollama_unavailable(mock_invoke, mock_env):
+    mock_invoke.side_effect = RuntimeError("All Ollama endpoints failed: connection refused")
     flights = [{"flight_number": "NY100", "origin": "New York", "destination": "London"}]
     result = generate_response("flights from New York", flights)
     assert "Flight NY100" in result, "Should use fallback when Ollama unavailable"
     assert "New York to London" in result, "Should include route in fallback"
 
-@patch("ollama_api.check_ollama_availability")
-def test_generate_response_ollama_not_initialized(mock_check, mock_env):
-    mock_check.return_value = (True, "Server available")
+def test_generate_response_ollama_not_initialized(mock_env):
     with patch("ollama_api.ollama_llm", None):
         flights = [{"flight_number": "NY100"}]
         result = generate_response("test query", flights)
         assert "Flight NY100" in result, "Should use fallback when ollama_llm is None"
 
-@patch("ollama_api.check_ollama_availability")
 @patch("ollama_api.ollama_llm.invoke")
-def test_generate_response_ollama_failure(mock_invoke, mock_check, mock_env):
-    mock_check.return_value = (True, "Server available")
+def test_generate_response_ollama_failure(mock_invoke, mock_env):
     mock_invoke.side_effect = Exception("LLM error")
-    with patch("ollama_api.ollama_llm", Mock()):
-        flights = [{"flight_number": "NY100"}]
-        result = generate_response("test query", flights)
-        assert "Flight NY100" in result, "Should use fallback on Ollama exception"
\ No newline at end of file
+    flights = [{"flight_number": "NY100"}]
+    result = generate_response("test query", flights)
+    assert "Flight NY100" in result, "Should use fallback on Ollama exception"
+
+# 5. Tests for prompt layout and warmup
+def test_build_response_prompt_stable_prefix():
+    first = build_response_prompt("flights from New York", "[]")
+    second = build_response_prompt("flights from Chicago", "No matching flights found.")
+    assert first.startswith(RESPONSE_PROMPT_PREFIX), "Prompt should start with the fixed prefix"
+    assert second.startswith(RESPONSE_PROMPT_PREFIX), "Prompt should start with the fixed prefix"
+    assert first.endswith("User Query: flights from New York\n"), "Query should be the last part of the prompt"
+
+def test_parse_keep_alive():
+    assert parse_keep_alive("-1") == -1, "Bare numbers should be sent as integer seconds"
+    assert parse_keep_alive("300") == 300, "Bare numbers should be sent as integer seconds"
+    assert parse_keep_alive("0.5") == 0.5, "Fractional numbers should be sent as float seconds"
+    assert parse_keep_alive("30m") == "30m", "Durations with units should stay strings"
+
+@patch("requests.post")
+def test_warmup_ollama_success(mock_post):
+    mock_post.return_value.status_code = 200
+    assert warmup_ollama() is True, "Should return True when the model loads"
+    payload = mock_post.call_args.kwargs["json"]
+    assert payload["prompt"] == "", "Warmup should not generate tokens"
+    assert "keep_alive" in payload, "Warmup should send keep_alive"
+
+@patch("requests.post")
+def test_warmup_ollama_failure(mock_post):
+    mock_post.side_effect = requests.RequestException("Connection error")
+    assert warmup_ollama() is False, "Should return False on request exception"
+
+@patch("ollama_api.warmup_ollama")
+def test_start_keep_warm(mock_warmup):
+    assert start_keep_warm(0) is None, "Interval 0 should disable keep-warm"
+    stop_event = start_keep_warm(0.01)
+    try:
+        time.sleep(0.1)
+    finally:
+        stop_event.set()
+    assert mock_warmup.call_count >= 2, "Should warm up at start and periodically"
+
+# 6. Tests for OllamaBackendPool
+@pytest.fixture
+def stub_servers():
+    servers = []
+
+    def start(delay):
+        server = StubOllamaServer(delay)
+        servers.append(server)
+        return server.url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+def unused_url():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"http://127.0.0.1:{port}"
+
+def test_pool_skips_endpoints_that_fail_to_initialize():
+    pool = OllamaBackendPool(["http://a:11434", "http://b:11434"], lambda url: None if "a" in url else Mock())
+    assert [endpoint.url for endpoint in pool.endpoints] == ["http://b:11434"], "Should drop uninitialized endpoints"
+    assert not OllamaBackendPool(["http://a:11434"], lambda url: None), "Empty pool should be falsy"
+
+def test_pool_prefers_least_outstanding_then_lowest_ewma():
+    pool = OllamaBackendPool(["http://a:11434", "http://b:11434", "http://c:11434"], lambda url: Mock())
+    a, b, c = pool.endpoints
+    a.outstanding, b.outstanding, c.outstanding = 1, 0, 0
+    b.ewma_latency, c.ewma_latency = 0.5, 0.1
+    assert pool.ordered_endpoints() == [c, b, a], "Should order by outstanding requests, then EWMA latency"
+
+def test_pool_updates_ewma_latency():
+    pool = OllamaBackendPool(["http://a:11434"], lambda url: Mock(), ewma_alpha=0.5)
+    endpoint = pool.endpoints[0]
+    with patch("ollama_api.time.perf_counter", side_effect=[0.0, 1.0, 0.0, 3.0]):
+        pool.invoke("prompt")
+        pool.invoke("prompt")
+    assert endpoint.ewma_latency == 2.0, "EWMA should blend new latency with the previous average"
+    assert endpoint.outstanding == 0, "Finished calls should not count as outstanding"
+
+def test_pool_fails_over_and_deprioritizes_failed_endpoint():
+    failing, working = Mock(), Mock()
+    failing.invoke.side_effect = Exception("connection refused")
+    working.invoke.return_value = "ok"
+    clients = {"http://a:11434": failing, "http://b:11434": working}
+    pool = OllamaBackendPool(list(clients), clients.get)
+    assert pool.invoke("prompt") == "ok", "Should fail over to the next endpoint"
+    assert pool.endpoints[0].healthy is False, "Failed endpoint should be marked unhealthy"
+    assert pool.ordered_endpoints()[-1].url == "http://a:11434", "Unhealthy endpoint should be tried last"
+
+def test_pool_raises_when_all_endpoints_fail():
+    client = Mock()
+    client.invoke.side_effect = Exception("boom")
+    pool = OllamaBackendPool(["http://a:11434", "http://b:11434"], lambda url: client)
+    with pytest.raises(RuntimeError):
+        pool.invoke("prompt")
+    assert client.invoke.call_count == 2, "Should try every endpoint once"
+
+def test_pool_retries_unhealthy_endpoint_after_cooldown():
+    failing, working = Mock(), Mock()
+    failing.invoke.side_effect = [Exception("connection refused"), "recovered"]
+    working.invoke.return_value = "ok"
+    clients = {"http://a:11434": failing, "http://b:11434": working}
+    pool = OllamaBackendPool(list(clients), clients.get, retry_seconds=0)
+    pool.invoke("prompt")
+    assert pool.endpoints[0].healthy is False, "Failed endpoint should be marked unhealthy"
+    assert pool.invoke("prompt") == "recovered", "Endpoint should be tried again once its cooldown expires"
+    assert pool.endpoints[0].healthy is True, "Successful call should mark the endpoint healthy again"
+
+def test_pool_routes_to_faster_stub_server(stub_servers):
+    slow_url, fast_url = stub_servers(0.2), stub_servers(0.0)
+    pool = OllamaBackendPool([slow_url, fast_url], initialize_ollama)
+    for _ in range(4):
+        pool.invoke("prompt")
+    slow, fast = pool.endpoints
+    assert fast.ewma_latency < slow.ewma_latency, "Fast stub should have the lower EWMA latency"
+    assert pool.invoke("prompt") == f"reply from {fast_url.rsplit(':', 1)[1]}", "Should route to the faster stub"
+
+def test_pool_balances_concurrent_requests_across_stub_servers(stub_servers):
+    urls = [stub_servers(0.1), stub_servers(0.1)]
+    pool = OllamaBackendPool(urls, initialize_ollama)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        replies = list(executor.map(pool.invoke, ["prompt"] * 4))
+    ports = {url.rsplit(":", 1)[1] for url in urls}
+    assert {reply.rsplit(" ", 1)[1] for reply in replies} == ports, "Concurrent requests should use both stubs"
+
+def test_pool_fails_over_from_dead_stub_server(stub_servers):
+    dead_url, live_url = unused_url(), stub_servers(0.0)
+    pool = OllamaBackendPool([dead_url, live_url], initialize_ollama)
+    is_available, message = pool.check_availability()
+    assert is_available is True, "Should be available while one endpoint is up"
+    assert live_url in message, "Should report the endpoint that responded"
+    assert pool.invoke("prompt").startswith("reply from"), "Should fail over to the live stub"
+    assert pool.endpoints[0].healthy is False, "Dead stub should be marked unhealthy"
+
+def test_pool_fails_over_from_hung_stub_server(stub_servers):
+    hung_url, live_url = stub_servers(2.0), stub_servers(0.0)
+    with patch("ollama_api.OLLAMA_REQUEST_TIMEOUT", 0.5):
+        pool = OllamaBackendPool([hung_url, live_url], initialize_ollama)
+    start = time.perf_counter()
+    reply = pool.invoke("prompt")
+    assert reply == f"reply from {live_url.rsplit(':', 1)[1]}", "Should complete on the second endpoint"
+    assert time.perf_counter() - start < 1.5, "Should give up on the hung endpoint after the timeout"
+    assert pool.endpoints[0].healthy is False, "Timed out endpoint should be marked unhealthy"
+
+def test_pool_warmup_updates_endpoint_health(stub_servers):
+    dead_url, live_url = unused_url(), stub_servers(0.0)
+    pool = OllamaBackendPool([dead_url, live_url], initialize_ollama)
+    assert pool.warmup(timeout=1) is True, "Should succeed while one endpoint warms up"
+    dead, live = pool.endpoints
+    assert dead.healthy is False, "Endpoint that failed warmup should be marked unhealthy"
+    assert live.healthy is True, "Warmed endpoint should stay healthy"
+
+def test_pool_warmup_remeasures_idle_endpoint(stub_servers):
+    fast_url, idle_url = stub_servers(0.0), stub_servers(0.0)
+    # Mock clients keep the timed invoke calls off the network; warmup still hits the stubs
+    pool = OllamaBackendPool([fast_url, idle_url], lambda url: Mock(), ewma_alpha=1.0)
+    fast, idle = pool.endpoints
+    with patch("ollama_api.time.perf_counter", side_effect=[0.0, 0.1, 0.0, 5.0]):
+        pool.invoke("prompt")
+        pool.invoke("prompt")
+    assert idle.ewma_latency == 5.0, "Idle endpoint should start with one slow measurement"
+    assert pool.ordered_endpoints()[0] is fast, "Sequential traffic should stick to the fast endpoint"
+    pool.warmup(timeout=1)
+    assert idle.ewma_latency < 1.0, "Warmup round trip should refresh the idle endpoint's EWMA"
+    assert idle.outstanding == 0, "Warmup should not leave requests outstanding"
+
+def test_check_availability_all_endpoints_down():
+    pool = OllamaBackendPool([unused_url(), unused_url()], initialize_ollama)
+    is_available, message = pool.check_availability()
+    assert is_available is False, "Should be unavailable when every endpoint is down"
+    assert "Ollama server is not available" in message, "Should return error message"